@@ -6,8 +6,13 @@ from plotly.subplots import make_subplots
 import sqlite3
 from datetime import datetime, timedelta
 import os
+import math
+import random
+import threading
 from pathlib import Path
 import bcrypt
+from categorizer import CategoryMatcher, RULE_TYPES, validate_rule
+from forecasting import FORECAST_HORIZON_DAYS, ForecastWorker, SpendingForecaster
 
 # Page configuration
 st.set_page_config(
@@ -42,9 +47,30 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+AUTO_CATEGORY = "🤖 Auto-detect"
+
+# Whitelisted ORDER BY clauses for the paged expense table
+SORT_ORDERS = {
+    "Date (Newest)": "date DESC, id DESC",
+    "Date (Oldest)": "date ASC, id ASC",
+    "Amount (High to Low)": "amount DESC, id DESC",
+    "Amount (Low to High)": "amount ASC, id ASC",
+}
+
+# Rows drawn for the approximate analytics mode
+ANALYTICS_SAMPLE_SIZE = 10000
+# Random id lookups, or rows read, allowed per sampled row; when matching rows
+# are sparser than that, the sample comes back smaller and its bounds wider
+ANALYTICS_MAX_DRAW_FACTOR = 20
+
+# Number of most recent change log entries kept by compaction; compaction
+# runs after every CHANGE_LOG_COMPACT_EVERY versions
+CHANGE_LOG_RETENTION = 10000
+CHANGE_LOG_COMPACT_EVERY = 1000
+
 class ExpenseTracker:
-    def __init__(self):
-        self.db_path = "expenses.db"
+    def __init__(self, db_path=None):
+        self.db_path = db_path or os.environ.get("EXPENSE_DB_PATH", "expenses.db")
         self.init_database()
     
     def init_database(self):
@@ -62,6 +88,9 @@ class ExpenseTracker:
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             )
         ''')
+        # Indexes backing the sorted, paged expense table
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_expenses_date ON expenses (date)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_expenses_amount ON expenses (amount)')
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS users (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -70,9 +99,82 @@ class ExpenseTracker:
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             )
         ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS expense_changes (
+                version INTEGER PRIMARY KEY AUTOINCREMENT,
+                op TEXT NOT NULL,
+                expense_id INTEGER,
+                changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        # Holds the change log horizon: the newest version dropped by compaction
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS change_log_state (
+                key TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS category_rules (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                category TEXT NOT NULL,
+                rule_type TEXT NOT NULL,
+                pattern TEXT,
+                min_amount REAL,
+                max_amount REAL,
+                priority INTEGER NOT NULL DEFAULT 0,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
         conn.commit()
+        self._init_daily_counts(cursor)
         conn.close()
 
+    def _init_daily_counts(self, cursor):
+        """Create the per-day expense counts used by sampled analytics
+
+        Triggers keep the counts in step with every write to the expenses
+        table, including bulk loaders that bypass ExpenseTracker. An existing
+        database is counted once, in the same transaction that adds the triggers.
+        """
+        if cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'expense_daily_counts'").fetchone():
+            return
+        cursor.execute('BEGIN IMMEDIATE')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS expense_daily_counts (
+                date TEXT PRIMARY KEY,
+                count INTEGER NOT NULL
+            )
+        ''')
+        self._create_daily_count_triggers(cursor)
+        cursor.execute('DELETE FROM expense_daily_counts')
+        cursor.execute('INSERT INTO expense_daily_counts (date, count) SELECT date, COUNT(*) FROM expenses GROUP BY date')
+        cursor.connection.commit()
+
+    def _create_daily_count_triggers(self, cursor):
+        """Create the triggers that keep expense_daily_counts up to date"""
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS expense_daily_counts_insert AFTER INSERT ON expenses
+            BEGIN
+                INSERT INTO expense_daily_counts (date, count) VALUES (NEW.date, 1)
+                ON CONFLICT (date) DO UPDATE SET count = count + 1;
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS expense_daily_counts_delete AFTER DELETE ON expenses
+            BEGIN
+                UPDATE expense_daily_counts SET count = count - 1 WHERE date = OLD.date;
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS expense_daily_counts_update AFTER UPDATE OF date ON expenses
+            BEGIN
+                UPDATE expense_daily_counts SET count = count - 1 WHERE date = OLD.date;
+                INSERT INTO expense_daily_counts (date, count) VALUES (NEW.date, 1)
+                ON CONFLICT (date) DO UPDATE SET count = count + 1;
+            END
+        ''')
+
     def register_user(self, username, password):
         """Register a new user with hashed password"""
         conn = sqlite3.connect(self.db_path)
@@ -99,7 +201,10 @@ class ExpenseTracker:
         return False
     
     def add_expense(self, date, category, description, amount, payment_method):
-        """Add a new expense to the database"""
+        """Add a new expense to the database, auto-categorizing it when no category is given"""
+        if not category:
+            category = self.get_matcher().categorize(description, amount, payment_method)
+        
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
@@ -107,8 +212,11 @@ class ExpenseTracker:
             INSERT INTO expenses (date, category, description, amount, payment_method)
             VALUES (?, ?, ?, ?, ?)
         ''', (date, category, description, amount, payment_method))
+        compact = self._log_changes(cursor, 'insert', [cursor.lastrowid])
         
         conn.commit()
+        if compact:
+            self._compact_changes(conn)
         conn.close()
     
     def get_expenses(self, start_date=None, end_date=None):
@@ -128,19 +236,400 @@ class ExpenseTracker:
         conn.close()
         return df
     
+    def get_expense_sample(self, start_date=None, sample_size=ANALYTICS_SAMPLE_SIZE):
+        """Retrieve a random sample of up to sample_size expenses on or after start_date
+
+        Returns the sample and the number of expenses it stands for. The count
+        comes from the per-day summary table and rows are fetched by primary
+        key, drawing more random ids until the sample is full, so the cost
+        depends on the sample size rather than on how much history is stored.
+        When matching rows are too sparse among the ids (backdated imports,
+        many deletes), the period is read in full if it is no bigger than the
+        draw budget of ANALYTICS_MAX_DRAW_FACTOR ids per wanted row; otherwise
+        the draws stop at that budget and the sample comes back smaller than
+        sample_size.
+        """
+        where, params = ('WHERE date >= ?', [start_date]) if start_date else ('', [])
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        population = cursor.execute(
+            f'SELECT COALESCE(SUM(count), 0) FROM expense_daily_counts {where}', params
+        ).fetchone()[0]
+        # Queried separately over the whole table so SQLite answers each from the primary key
+        min_id = cursor.execute('SELECT MIN(id) FROM expenses').fetchone()[0]
+        max_id = cursor.execute('SELECT MAX(id) FROM expenses').fetchone()[0]
+        
+        span = max_id - min_id + 1 if population else 0
+        max_draws = min(span, sample_size * ANALYTICS_MAX_DRAW_FACTOR)
+        draws = int(sample_size * span / population) if population else 0
+        if population <= sample_size or (draws > max_draws and population <= max_draws):
+            df = pd.read_sql_query(f'SELECT * FROM expenses {where}', conn, params=params)
+            conn.close()
+            return df, population
+        
+        # First round: one random id per equal-width block of ids; ids follow
+        # insertion order, so the sample is spread evenly across the history
+        draws = min(draws, max_draws)
+        block = span / draws
+        ids = {min_id + int((i + random.random()) * block) for i in range(draws)}
+        
+        drawn = set()
+        chunks = []
+        found = 0
+        while ids:
+            drawn |= ids
+            ids = sorted(ids)
+            for start in range(0, len(ids), 900):
+                chunk = ids[start:start + 900]
+                placeholders = ', '.join('?' * len(chunk))
+                query = f'SELECT * FROM expenses WHERE id IN ({placeholders})'
+                if start_date:
+                    query += ' AND date >= ?'
+                chunk_df = pd.read_sql_query(query, conn, params=chunk + params)
+                if not chunk_df.empty:
+                    chunks.append(chunk_df)
+                found += len(chunk_df)
+            
+            missing = sample_size - found
+            if missing <= 0:
+                break
+            # Top up with fresh ids, sized from the hit rate seen so far
+            hit_rate = max(found / len(drawn), 1 / span)
+            more = min(int(missing / hit_rate * 1.1) + 1, max_draws - len(drawn))
+            if more <= 0:
+                break
+            ids = set(random.sample(range(min_id, max_id + 1), more)) - drawn
+        
+        if not chunks:
+            chunks.append(pd.read_sql_query('SELECT * FROM expenses LIMIT 0', conn))
+        df = pd.concat(chunks, ignore_index=True)
+        if len(df) > sample_size:
+            df = df.sample(n=sample_size, ignore_index=True)
+        conn.close()
+        return df, population
+    
+    def get_max_amount(self, start_date=None):
+        """Return the highest expense amount on or after start_date"""
+        where, params = ('WHERE date >= ?', [start_date]) if start_date else ('', [])
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute(f'SELECT MAX(amount) FROM expenses {where}', params)
+        max_amount = cursor.fetchone()[0]
+        conn.close()
+        return max_amount
+    
     def delete_expense(self, expense_id):
         """Delete an expense by ID"""
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
         cursor.execute('DELETE FROM expenses WHERE id = ?', (expense_id,))
+        compact = cursor.rowcount and self._log_changes(cursor, 'delete', [expense_id])
+        
+        conn.commit()
+        if compact:
+            self._compact_changes(conn)
+        conn.close()
+
+    def _expense_filters(self, category=None, payment_method=None):
+        """Build the WHERE clause and parameters for the expense table filters"""
+        conditions = []
+        params = []
+        if category:
+            conditions.append('category = ?')
+            params.append(category)
+        if payment_method:
+            conditions.append('payment_method = ?')
+            params.append(payment_method)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        return where, params
+
+    def count_expenses(self, category=None, payment_method=None):
+        """Count expenses matching the given filters"""
+        where, params = self._expense_filters(category, payment_method)
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute(f'SELECT COUNT(*) FROM expenses {where}', params)
+        total = cursor.fetchone()[0]
+        conn.close()
+        return total
+
+    def get_expenses_page(self, category=None, payment_method=None, sort_by="Date (Newest)", limit=50, offset=0):
+        """Retrieve one page of filtered, sorted expenses"""
+        where, params = self._expense_filters(category, payment_method)
+        conn = sqlite3.connect(self.db_path)
+        df = pd.read_sql_query(
+            f'SELECT * FROM expenses {where} ORDER BY {SORT_ORDERS[sort_by]} LIMIT ? OFFSET ?',
+            conn,
+            params=params + [limit, offset]
+        )
+        conn.close()
+        return df
+    
+    def delete_expenses(self, expense_ids):
+        """Delete several expenses by ID in a single statement"""
+        expense_ids = [int(expense_id) for expense_id in expense_ids]
+        if not expense_ids:
+            return
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        placeholders = ', '.join('?' * len(expense_ids))
+        cursor.execute(f'SELECT id FROM expenses WHERE id IN ({placeholders})', expense_ids)
+        existing_ids = [row[0] for row in cursor.fetchall()]
+        cursor.execute(f'DELETE FROM expenses WHERE id IN ({placeholders})', expense_ids)
+        compact = self._log_changes(cursor, 'delete', existing_ids)
+        
+        conn.commit()
+        if compact:
+            self._compact_changes(conn)
+        conn.close()
+
+    def clear_expenses(self):
+        """Delete every expense"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        # A delete trigger stops SQLite from truncating the table in one step,
+        # so it is dropped and recreated around the delete, atomically
+        cursor.execute('BEGIN IMMEDIATE')
+        cursor.execute('DROP TRIGGER IF EXISTS expense_daily_counts_delete')
+        cursor.execute('DELETE FROM expenses')
+        cursor.execute('DELETE FROM expense_daily_counts')
+        self._create_daily_count_triggers(cursor)
+        compact = self._log_changes(cursor, 'clear', [None])
+        
+        conn.commit()
+        if compact:
+            self._compact_changes(conn)
+        conn.close()
+
+    def _log_changes(self, cursor, op, expense_ids):
+        """Append change log entries inside the caller's transaction
+
+        Returns True when the log has grown past another compaction step; the
+        caller should then call _compact_changes once it has committed.
+        """
+        cursor.executemany(
+            'INSERT INTO expense_changes (op, expense_id) VALUES (?, ?)',
+            [(op, expense_id) for expense_id in expense_ids]
+        )
+        cursor.execute('SELECT MAX(version) FROM expense_changes')
+        version = cursor.fetchone()[0] or 0
+        return version // CHANGE_LOG_COMPACT_EVERY != (version - len(expense_ids)) // CHANGE_LOG_COMPACT_EVERY
+
+    def _compact_changes(self, conn, retention=CHANGE_LOG_RETENTION):
+        """Drop change log entries older than the retention window in their own transaction
+
+        Every entry at or below the new horizon goes, tombstones included; it is
+        a range delete on the primary key, so its cost is the number of entries
+        dropped. Clients older than the horizon must resync in full.
+        """
+        cursor = conn.cursor()
+        cursor.execute('SELECT MAX(version) FROM expense_changes')
+        horizon = (cursor.fetchone()[0] or 0) - retention
+        if horizon <= self._get_horizon(cursor):
+            return
+        cursor.execute('DELETE FROM expense_changes WHERE version <= ?', (horizon,))
+        cursor.execute("INSERT OR REPLACE INTO change_log_state (key, value) VALUES ('horizon', ?)", (horizon,))
+        conn.commit()
+
+    def _get_horizon(self, cursor):
+        """Return the newest version dropped from the change log, or 0 if none was"""
+        cursor.execute("SELECT value FROM change_log_state WHERE key = 'horizon'")
+        row = cursor.fetchone()
+        return row[0] if row else 0
+
+    def compact_changes(self, retention=CHANGE_LOG_RETENTION):
+        """Compact the change log, keeping the most recent entries"""
+        conn = sqlite3.connect(self.db_path)
+        self._compact_changes(conn, retention)
+        conn.close()
+
+    def get_current_version(self):
+        """Return the latest change log version, or 0 if nothing has changed yet"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute('SELECT MAX(version) FROM expense_changes')
+        version = cursor.fetchone()[0] or 0
+        conn.close()
+        return version
+
+    def changes_since(self, version):
+        """Retrieve the net change for each expense modified after the given version
+
+        Rows come back in version order with the current expense values. Apply
+        'insert' and 'update' as upserts, drop the row on 'delete', and drop
+        everything on 'clear'; then resume from the highest version returned.
+
+        Returns None if entries after the given version have been compacted
+        away. The caller must then resync in full: read get_current_version(),
+        reload the expenses, and resume from that version.
+        """
+        conn = sqlite3.connect(self.db_path)
+        query = '''
+            SELECT c.version,
+                   CASE WHEN c.op != 'clear' AND e.id IS NULL THEN 'delete' ELSE c.op END AS op,
+                   c.expense_id, e.date, e.category, e.description, e.amount, e.payment_method
+            FROM expense_changes c
+            LEFT JOIN expenses e ON e.id = c.expense_id
+            WHERE c.version > ? AND c.version IN (
+                SELECT MAX(version) FROM expense_changes
+                WHERE version > ?
+                GROUP BY COALESCE(expense_id, -version)
+            )
+            ORDER BY c.version
+        '''
+        df = pd.read_sql_query(query, conn, params=[version, version])
+        # Checked after reading: a compaction committed before the read has
+        # already moved the horizon, and one committed later removed nothing
+        # the read still needed
+        horizon = self._get_horizon(conn.cursor())
+        conn.close()
+        if version < horizon:
+            return None
+        return df
+
+    def add_rule(self, category, rule_type, pattern=None, min_amount=None, max_amount=None, priority=0):
+        """Add a categorization rule; returns an error message, or None on success"""
+        error = validate_rule(rule_type, pattern, min_amount, max_amount)
+        if error:
+            return error
         
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute('''
+            INSERT INTO category_rules (category, rule_type, pattern, min_amount, max_amount, priority)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (category, rule_type, pattern, min_amount, max_amount, priority))
         conn.commit()
         conn.close()
+        return None
+
+    def get_rules(self):
+        """Retrieve all categorization rules in evaluation order"""
+        conn = sqlite3.connect(self.db_path)
+        df = pd.read_sql_query('SELECT * FROM category_rules ORDER BY priority DESC, id', conn)
+        conn.close()
+        return df
+
+    def delete_rule(self, rule_id):
+        """Delete a categorization rule by ID"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute('DELETE FROM category_rules WHERE id = ?', (rule_id,))
+        conn.commit()
+        conn.close()
+
+    def get_rules_version(self):
+        """Return a value that changes whenever a categorization rule is added or deleted
+
+        Rules are never edited and their ids are never reused, so the number of
+        rules and the highest id together identify the current set.
+        """
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute('SELECT COUNT(*), MAX(id) FROM category_rules')
+        version = cursor.fetchone()
+        conn.close()
+        return version
+
+    def get_matcher(self):
+        """Return the compiled matcher for the current rules, shared by every session"""
+        return load_matcher(self.db_path, self.get_rules_version())
+
+    def recategorize_expenses(self, batch_size=10000, progress=None, matcher=None):
+        """Re-apply the categorization rules to stored expenses; returns the number of rows changed
+
+        Each batch is updated and logged in its own short transaction, so other
+        writers only ever wait for one batch. progress, if given, is called
+        with the rows checked and changed so far after every batch.
+        """
+        matcher = matcher or self.get_matcher()
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+
+        # Walk the table in id order so updates never race an open SELECT
+        processed = 0
+        changed = 0
+        last_id = 0
+        while True:
+            cursor.execute('''
+                SELECT id, category, description, amount, payment_method FROM expenses
+                WHERE id > ? ORDER BY id LIMIT ?
+            ''', (last_id, batch_size))
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            updates = []
+            for expense_id, category, description, amount, payment_method in rows:
+                # Rows no rule applies to keep their current, possibly hand-picked, category
+                new_category = matcher.match(description, amount, payment_method)
+                if new_category is not None and new_category != category:
+                    updates.append((new_category, expense_id))
+            if updates:
+                cursor.executemany('UPDATE expenses SET category = ? WHERE id = ?', updates)
+                compact = self._log_changes(cursor, 'update', [expense_id for _, expense_id in updates])
+                conn.commit()
+                if compact:
+                    self._compact_changes(conn)
+            processed += len(rows)
+            changed += len(updates)
+            last_id = rows[-1][0]
+            if progress:
+                progress(processed, changed)
+        
+        conn.close()
+        return changed
+
+class RecategorizeJob(threading.Thread):
+    def __init__(self, tracker):
+        """Background thread that re-applies the categorization rules to every stored expense"""
+        super().__init__(name="recategorize", daemon=True)
+        self.tracker = tracker
+        # Fetched here, on the script thread, where the shared matcher cache is available
+        self.matcher = tracker.get_matcher()
+        self.total = 0
+        self.processed = 0
+        self.changed = 0
+        self.error = None
+
+    def run(self):
+        try:
+            self.total = self.tracker.count_expenses()
+            self.tracker.recategorize_expenses(progress=self._progress, matcher=self.matcher)
+        except Exception as e:
+            self.error = f"{type(e).__name__}: {e}"
+
+    def _progress(self, processed, changed):
+        self.processed = processed
+        self.changed = changed
+
+@st.cache_resource
+def get_recategorize_jobs():
+    """Re-categorization jobs by database path, shared by every session"""
+    return {}
+
+@st.cache_resource(max_entries=4)
+def load_matcher(db_path, rules_version):
+    """Compile the categorization rules once per rules version for the whole server process"""
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    rows = conn.execute('SELECT * FROM category_rules').fetchall()
+    conn.close()
+    return CategoryMatcher(rows)
+
+@st.cache_resource
+def get_forecast_worker(db_path):
+    """Start one background forecasting worker per server process"""
+    worker = ForecastWorker(SpendingForecaster(db_path))
+    worker.start()
+    return worker
 
 def main():
     # Initialize expense tracker
     tracker = ExpenseTracker()
+    get_forecast_worker(tracker.db_path)
 
     # --- Authentication UI ---
     if 'authenticated' not in st.session_state:
@@ -288,7 +777,7 @@ def show_add_expense(tracker):
             date = st.date_input("Date", value=datetime.now())
             category = st.selectbox(
                 "Category",
-                ["Food & Dining", "Transportation", "Shopping", "Entertainment", 
+                [AUTO_CATEGORY, "Food & Dining", "Transportation", "Shopping", "Entertainment", 
                  "Healthcare", "Utilities", "Housing", "Education", "Travel", "Mobile & Internet", "Other"]
             )
             amount = st.number_input("Amount (₹)", min_value=0.01, value=0.01, step=0.01)
@@ -305,7 +794,7 @@ def show_add_expense(tracker):
             if description.strip():
                 tracker.add_expense(
                     date.strftime('%Y-%m-%d'),
-                    category,
+                    None if category == AUTO_CATEGORY else category,
                     description,
                     amount,
                     payment_method
@@ -338,110 +827,155 @@ def show_view_expenses(tracker):
     with col3:
         sort_by = st.selectbox("Sort by", ["Date (Newest)", "Date (Oldest)", "Amount (High to Low)", "Amount (Low to High)"])
     
-    # Get all expenses
-    expenses_df = tracker.get_expenses()
+    # Fetch only the visible page; filtering, sorting and paging happen in SQL
+    col1, col2 = st.columns([1, 3])
+    with col1:
+        page_size = st.selectbox("Rows per page", [25, 50, 100, 250], index=1)
     
-    if expenses_df.empty:
+    category_value = None if category_filter == "All Categories" else category_filter
+    payment_value = None if payment_filter == "All Methods" else payment_filter
+    total = tracker.count_expenses(category_value, payment_value)
+    
+    if total == 0:
         st.info("No expenses found. Add some expenses to get started!")
         return
     
-    # Apply filters
-    if category_filter != "All Categories":
-        expenses_df = expenses_df[expenses_df['category'] == category_filter]
-    
-    if payment_filter != "All Methods":
-        expenses_df = expenses_df[expenses_df['payment_method'] == payment_filter]
+    num_pages = (total - 1) // page_size + 1
+    with col2:
+        page_number = st.number_input(f"Page (of {num_pages})", min_value=1, max_value=num_pages, value=1, step=1)
     
-    # Apply sorting
-    if sort_by == "Date (Newest)":
-        expenses_df = expenses_df.sort_values('date', ascending=False)
-    elif sort_by == "Date (Oldest)":
-        expenses_df = expenses_df.sort_values('date', ascending=True)
-    elif sort_by == "Amount (High to Low)":
-        expenses_df = expenses_df.sort_values('amount', ascending=False)
-    elif sort_by == "Amount (Low to High)":
-        expenses_df = expenses_df.sort_values('amount', ascending=True)
+    expenses_df = tracker.get_expenses_page(
+        category_value,
+        payment_value,
+        sort_by,
+        limit=page_size,
+        offset=(page_number - 1) * page_size
+    )
     
     # Display expenses
-    st.subheader(f"Found {len(expenses_df)} expenses")
+    st.subheader(f"Found {total} expenses")
     
-    # Add delete functionality
-    for index, row in expenses_df.iterrows():
-        col1, col2, col3, col4, col5, col6 = st.columns([1, 2, 3, 1, 1, 1])
-        
-        with col1:
-            st.write(row['date'])
-        with col2:
-            st.write(f"**{row['category']}**")
-        with col3:
-            st.write(row['description'])
-        with col4:
-            st.write(f"₹{row['amount']:.2f}")
-        with col5:
-            st.write(row['payment_method'])
-        with col6:
-            if st.button(f"🗑️", key=f"delete_{row['id']}"):
-                tracker.delete_expense(row['id'])
-                st.success("Expense deleted!")
-                st.rerun()
-        
-        st.divider()
+    # One grid for the whole page; the Select column drives batch delete
+    expenses_df.insert(0, 'select', False)
+    edited_df = st.data_editor(
+        expenses_df[['select', 'id', 'date', 'category', 'description', 'amount', 'payment_method']],
+        column_config={
+            'select': st.column_config.CheckboxColumn("Select"),
+            'id': None,
+            'date': "Date",
+            'category': "Category",
+            'description': "Description",
+            'amount': st.column_config.NumberColumn("Amount", format="₹%.2f"),
+            'payment_method': "Payment Method",
+        },
+        disabled=['id', 'date', 'category', 'description', 'amount', 'payment_method'],
+        hide_index=True,
+        use_container_width=True,
+        key=f"expenses_{category_filter}_{payment_filter}_{sort_by}_{page_size}_{page_number}"
+    )
+    
+    selected_ids = edited_df.loc[edited_df['select'], 'id'].tolist()
+    if st.button(f"🗑️ Delete Selected ({len(selected_ids)})", disabled=not selected_ids):
+        tracker.delete_expenses(selected_ids)
+        st.success(f"Deleted {len(selected_ids)} expenses!")
+        st.rerun()
 
 def show_analytics(tracker):
     """Advanced analytics and insights"""
     st.header("📈 Analytics & Insights")
     
-    # Get all expenses
-    expenses_df = tracker.get_expenses()
-    
-    if expenses_df.empty:
-        st.info("No expenses found. Add some expenses to see analytics!")
-        return
+    # Time period selector
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        period = st.selectbox("Select Time Period", ["Last 30 Days", "Last 3 Months", "Last 6 Months", "Last Year", "All Time"])
+    with col2:
+        fast_mode = st.toggle(
+            "⚡ Fast approximate mode",
+            help="Estimate results from a random sample instead of reading every expense"
+        )
     
-    # Convert date column
-    expenses_df['date'] = pd.to_datetime(expenses_df['date'])
+    period_days = {"Last 30 Days": 30, "Last 3 Months": 90, "Last 6 Months": 180, "Last Year": 365}
+    start_date = datetime.now() - timedelta(days=period_days[period]) if period in period_days else None
     
-    # Time period selector
-    period = st.selectbox("Select Time Period", ["Last 30 Days", "Last 3 Months", "Last 6 Months", "Last Year", "All Time"])
-    
-    # Filter data based on period
-    if period == "Last 30 Days":
-        start_date = datetime.now() - timedelta(days=30)
-        filtered_df = expenses_df[expenses_df['date'] >= start_date]
-    elif period == "Last 3 Months":
-        start_date = datetime.now() - timedelta(days=90)
-        filtered_df = expenses_df[expenses_df['date'] >= start_date]
-    elif period == "Last 6 Months":
-        start_date = datetime.now() - timedelta(days=180)
-        filtered_df = expenses_df[expenses_df['date'] >= start_date]
-    elif period == "Last Year":
-        start_date = datetime.now() - timedelta(days=365)
-        filtered_df = expenses_df[expenses_df['date'] >= start_date]
+    if fast_mode:
+        filtered_df, population = tracker.get_expense_sample(start_date.strftime('%Y-%m-%d') if start_date else None)
+        if population == 0:
+            st.warning(f"No expenses found for {period}")
+            return
+        if len(filtered_df) < 2 and population > len(filtered_df):
+            st.warning(f"Too few of the {population:,} expenses for {period} could be sampled. "
+                       "Turn off fast mode for exact results.")
+            return
+        filtered_df['date'] = pd.to_datetime(filtered_df['date'])
     else:
-        filtered_df = expenses_df
+        # Get all expenses
+        expenses_df = tracker.get_expenses()
+        
+        if expenses_df.empty:
+            st.info("No expenses found. Add some expenses to see analytics!")
+            return
+        
+        # Convert date column
+        expenses_df['date'] = pd.to_datetime(expenses_df['date'])
+        
+        # Filter data based on period
+        filtered_df = expenses_df[expenses_df['date'] >= start_date] if start_date else expenses_df
+        
+        if filtered_df.empty:
+            st.warning(f"No expenses found for {period}")
+            return
+        population = len(filtered_df)
     
-    if filtered_df.empty:
-        st.warning(f"No expenses found for {period}")
-        return
+    # Sums and counts from a sample are scaled up to the whole period
+    sample_size = len(filtered_df)
+    scale = population / sample_size
+    approximate = sample_size < population
+    if approximate:
+        st.caption(
+            f"⚡ Approximate results from a sample of {sample_size:,} of {population:,} expenses. "
+            "Totals, averages and counts are estimates shown with 95% confidence bounds."
+        )
+        if sample_size < ANALYTICS_SAMPLE_SIZE:
+            st.caption("Expenses in this period are sparse among all stored ids, so the sample is "
+                       "smaller than usual and the bounds are wider.")
     
     # Key insights
     col1, col2, col3, col4 = st.columns(4)
     
+    amount_std = filtered_df['amount'].std() if sample_size > 1 else 0.0
+    mean_margin = _margin_of_error(amount_std, sample_size, population)
+    
     with col1:
-        total = filtered_df['amount'].sum()
-        st.metric("Total Expenses", f"₹{total:,.2f}")
+        total = filtered_df['amount'].sum() * scale
+        if approximate:
+            st.metric("Total Expenses", f"₹{total:,.2f}", f"±₹{mean_margin * population:,.2f}", delta_color="off")
+        else:
+            st.metric("Total Expenses", f"₹{total:,.2f}")
     
     with col2:
         avg = filtered_df['amount'].mean()
-        st.metric("Average Expense", f"₹{avg:,.2f}")
+        if approximate:
+            st.metric("Average Expense", f"₹{avg:,.2f}", f"±₹{mean_margin:,.2f}", delta_color="off")
+        else:
+            st.metric("Average Expense", f"₹{avg:,.2f}")
     
     with col3:
-        max_expense = filtered_df['amount'].max()
+        # The maximum cannot be estimated from a sample, but it is a cheap indexed lookup
+        if approximate:
+            max_expense = tracker.get_max_amount(start_date.strftime('%Y-%m-%d') if start_date else None)
+        else:
+            max_expense = filtered_df['amount'].max()
         st.metric("Highest Expense", f"₹{max_expense:,.2f}")
     
     with col4:
         most_common_category = filtered_df['category'].mode().iloc[0] if not filtered_df['category'].mode().empty else "N/A"
-        st.metric("Most Common Category", most_common_category)
+        if approximate:
+            share = (filtered_df['category'] == most_common_category).mean()
+            share_margin = _margin_of_error(math.sqrt(share * (1 - share)), sample_size, population)
+            st.metric("Most Common Category", most_common_category,
+                      f"{share:.1%} ± {share_margin:.1%} of expenses", delta_color="off")
+        else:
+            st.metric("Most Common Category", most_common_category)
     
     # Advanced charts
     col1, col2 = st.columns(2)
@@ -450,6 +984,7 @@ def show_analytics(tracker):
         # Monthly trend
         monthly_expenses = filtered_df.groupby(filtered_df['date'].dt.to_period('M'))['amount'].sum().reset_index()
         monthly_expenses['date'] = monthly_expenses['date'].astype(str)
+        monthly_expenses['amount'] *= scale
         
         fig_monthly = px.bar(
             monthly_expenses,
@@ -478,6 +1013,9 @@ def show_analytics(tracker):
         'amount': ['sum', 'mean', 'count']
     }).round(2)
     category_analysis.columns = ['Total Amount', 'Average Amount', 'Number of Expenses']
+    if approximate:
+        category_analysis['Total Amount'] = (category_analysis['Total Amount'] * scale).round(2)
+        category_analysis['Number of Expenses'] = (category_analysis['Number of Expenses'] * scale).round().astype(int)
     category_analysis = category_analysis.sort_values('Total Amount', ascending=False)
     
     st.dataframe(category_analysis, use_container_width=True)
@@ -492,7 +1030,7 @@ def show_analytics(tracker):
         filtered_df['day_of_week'] = filtered_df['date'].dt.day_name()
         day_analysis = filtered_df.groupby('day_of_week')['amount'].sum().reindex([
             'Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday'
-        ])
+        ]) * scale
         
         fig_day = px.bar(
             x=day_analysis.index,
@@ -506,7 +1044,7 @@ def show_analytics(tracker):
         # Hour analysis (if time data available)
         if 'created_at' in filtered_df.columns:
             filtered_df['hour'] = pd.to_datetime(filtered_df['created_at']).dt.hour
-            hour_analysis = filtered_df.groupby('hour')['amount'].sum()
+            hour_analysis = filtered_df.groupby('hour')['amount'].sum() * scale
             
             fig_hour = px.line(
                 x=hour_analysis.index,
@@ -515,6 +1053,67 @@ def show_analytics(tracker):
                 labels={'x': 'Hour', 'y': 'Amount (₹)'}
             )
             st.plotly_chart(fig_hour, use_container_width=True)
+    
+    # Forecasts and anomalies are computed by the background worker; just read them here
+    st.subheader("🔮 Forecast & Unusual Expenses")
+    
+    worker = get_forecast_worker(tracker.db_path)
+    forecaster = worker.forecaster
+    if st.button("🔄 Update Forecasts Now"):
+        worker.trigger()
+        st.info("Forecasts are being updated in the background. Refresh in a moment to see the results.")
+    if worker.last_error:
+        st.warning(f"The last forecast update failed: {worker.last_error}")
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        forecasts_df = forecaster.get_forecasts()
+        if forecasts_df.empty:
+            st.info("Forecasts will appear once the background worker has processed your expenses.")
+        else:
+            fig_forecast = go.Figure(go.Bar(
+                x=forecasts_df['category'],
+                y=forecasts_df['forecast'],
+                error_y=dict(
+                    type='data',
+                    symmetric=False,
+                    array=forecasts_df['upper'] - forecasts_df['forecast'],
+                    arrayminus=forecasts_df['forecast'] - forecasts_df['lower']
+                )
+            ))
+            fig_forecast.update_layout(
+                title=f"Forecast Spending for the Next {FORECAST_HORIZON_DAYS} Days",
+                xaxis_title="Category",
+                yaxis_title="Amount (₹)"
+            )
+            st.plotly_chart(fig_forecast, use_container_width=True)
+            st.caption(f"Forecast total: ₹{forecasts_df['forecast'].sum():,.2f} "
+                       f"(last updated {forecasts_df['updated_at'].max()})")
+    
+    with col2:
+        anomalies_df = forecaster.get_anomalies()
+        if anomalies_df.empty:
+            st.info("No unusual expenses detected.")
+        else:
+            st.write("**Expenses far above their category's typical amount**")
+            st.dataframe(
+                anomalies_df[['date', 'category', 'description', 'amount', 'typical_amount']].rename(columns={
+                    'date': 'Date',
+                    'category': 'Category',
+                    'description': 'Description',
+                    'amount': 'Amount',
+                    'typical_amount': 'Typical Amount'
+                }),
+                hide_index=True,
+                use_container_width=True
+            )
+
+def _margin_of_error(std, sample_size, population):
+    """95% margin of error for a sample mean, with finite population correction"""
+    if sample_size >= population or sample_size < 2:
+        return 0.0
+    return 1.96 * std / math.sqrt(sample_size) * math.sqrt((population - sample_size) / (population - 1))
 
 def show_settings(tracker):
     """Settings and data management"""
@@ -541,13 +1140,85 @@ def show_settings(tracker):
     with col2:
         if st.button("🗑️ Clear All Data"):
             if st.checkbox("I understand this will permanently delete all expense data"):
-                conn = sqlite3.connect(tracker.db_path)
-                cursor = conn.cursor()
-                cursor.execute('DELETE FROM expenses')
-                conn.commit()
-                conn.close()
+                tracker.clear_expenses()
                 st.success("All data cleared successfully!")
-    
+
+    st.subheader("Categorization Rules")
+
+    col1, col2, col3 = st.columns(3)
+
+    with col1:
+        rule_category = st.selectbox(
+            "Rule Category",
+            ["Food & Dining", "Transportation", "Shopping", "Entertainment",
+             "Healthcare", "Utilities", "Housing", "Education", "Travel", "Mobile & Internet", "Other"]
+        )
+        rule_type = st.selectbox("Rule Type", RULE_TYPES)
+
+    with col2:
+        if rule_type == "Payment Method":
+            rule_pattern = st.selectbox(
+                "Payment Method",
+                ["Cash", "Credit Card", "Debit Card", "Bank Transfer", "Digital Wallet", "Other"],
+                key="rule_payment_method"
+            )
+        elif rule_type == "Keyword":
+            rule_pattern = st.text_input("Keyword", placeholder="e.g. uber", key="rule_keyword",
+                                         help="Matches whole words, ignoring case and punctuation")
+        elif rule_type == "Regex":
+            rule_pattern = st.text_input("Pattern", placeholder="e.g. uber|ola", key="rule_regex",
+                                         help="Python regular expression, searched ignoring case")
+        else:
+            rule_pattern = None
+        rule_priority = st.number_input("Priority", value=0, step=1, help="Higher priority rules are checked first")
+
+    with col3:
+        min_amount = st.number_input("Minimum Amount (₹, 0 = none)", min_value=0.0, value=0.0, step=1.0)
+        max_amount = st.number_input("Maximum Amount (₹, 0 = none)", min_value=0.0, value=0.0, step=1.0)
+
+    if st.button("➕ Add Rule"):
+        error = tracker.add_rule(
+            rule_category,
+            rule_type,
+            rule_pattern,
+            min_amount or None,
+            max_amount or None,
+            int(rule_priority)
+        )
+        if error:
+            st.error(error)
+        else:
+            st.success("Rule added!")
+
+    rules_df = tracker.get_rules()
+    if rules_df.empty:
+        st.info("No categorization rules yet. Expenses saved with Auto-detect will be filed under Other.")
+    else:
+        st.dataframe(rules_df[['id', 'priority', 'rule_type', 'pattern', 'min_amount', 'max_amount', 'category']],
+                     use_container_width=True)
+        col1, col2 = st.columns(2)
+        with col1:
+            rule_to_delete = st.selectbox("Rule to delete", rules_df['id'].tolist())
+            if st.button("🗑️ Delete Rule"):
+                tracker.delete_rule(int(rule_to_delete))
+                st.rerun()
+        with col2:
+            jobs = get_recategorize_jobs()
+            job = jobs.get(tracker.db_path)
+            running = job is not None and job.is_alive()
+            if st.button("🔁 Re-categorize All Expenses", disabled=running):
+                # Runs in the background so this session and others stay responsive
+                job = jobs[tracker.db_path] = RecategorizeJob(tracker)
+                job.start()
+            if job and job.is_alive():
+                st.progress(min(job.processed / job.total, 1.0) if job.total else 0.0,
+                            text=f"Re-categorizing: {job.processed:,} expenses checked, {job.changed:,} updated")
+                st.button("🔄 Refresh Progress")
+            elif job and job.error:
+                st.error(f"Re-categorization failed after {job.processed:,} expenses: {job.error}")
+            elif job:
+                st.success(f"Updated the category of {job.changed:,} of {job.processed:,} expenses.")
+
     st.subheader("App Information")
     st.info("""
     **Personal Expense Tracker v1.0**
@@ -0,0 +1,89 @@
+"""
+Forecasting Benchmark for Personal Expense Tracker
+This script times a full model refit and an incremental update on a generated
+expense history in a temporary database.
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from app import ExpenseTracker
+from forecasting import SpendingForecaster
+
+CATEGORIES = [
+    "Food & Dining", "Transportation", "Shopping", "Entertainment",
+    "Healthcare", "Utilities", "Housing", "Education", "Travel", "Mobile & Internet", "Other"
+]
+
+PAYMENT_METHODS = ["Cash", "Credit Card", "Debit Card", "Bank Transfer", "Digital Wallet", "Other"]
+
+
+def create_history(db_path, num_expenses, years):
+    """Create a database with the app's schema and num_expenses random expenses spread over the given years"""
+    ExpenseTracker(db_path)
+    start_date = datetime.now() - timedelta(days=365 * years)
+    span_days = 365 * years
+    rows = (
+        (
+            (start_date + timedelta(days=span_days * i // num_expenses)).strftime('%Y-%m-%d'),
+            random.choice(CATEGORIES),
+            "Benchmark expense",
+            round(random.lognormvariate(4, 1), 2),
+            random.choice(PAYMENT_METHODS),
+        )
+        for i in range(num_expenses)
+    )
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    cursor.executemany('''
+        INSERT INTO expenses (date, category, description, amount, payment_method)
+        VALUES (?, ?, ?, ?, ?)
+    ''', rows)
+    conn.commit()
+    conn.close()
+
+
+def add_expenses(db_path, count):
+    """Add today's expenses through ExpenseTracker.add_expense, so they are logged like the app's"""
+    tracker = ExpenseTracker(db_path)
+    today = datetime.now().strftime('%Y-%m-%d')
+    for _ in range(count):
+        tracker.add_expense(today, random.choice(CATEGORIES), "New expense",
+                            round(random.lognormvariate(4, 1), 2), "Cash")
+
+
+def timed(func, *args):
+    """Run func and return its result and the elapsed time in seconds"""
+    started = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark forecast refit and incremental update times")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100000, 1000000], help="history sizes to test")
+    parser.add_argument("--years", type=int, default=10, help="years of history to spread expenses over")
+    parser.add_argument("--new", type=int, default=100, help="expenses added before the incremental update")
+    args = parser.parse_args()
+
+    print(f"{'expenses':>10} {'full refit (s)':>15} {'rows/s':>12} {'incremental (s)':>16}")
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            db_path = os.path.join(tmp_dir, "benchmark.db")
+            create_history(db_path, size, args.years)
+            forecaster = SpendingForecaster(db_path)
+
+            processed, refit_seconds = timed(forecaster.refit)
+            add_expenses(db_path, args.new)
+            _, update_seconds = timed(forecaster.update)
+
+            print(f"{processed:>10,} {refit_seconds:>15.2f} {processed / refit_seconds:>12,.0f} {update_seconds:>16.3f}")
+
+
+if __name__ == "__main__":
+    main()
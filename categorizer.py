@@ -0,0 +1,183 @@
+"""
+Rule-based Auto-Categorization for Personal Expense Tracker
+Keyword rules are looked up in a dictionary of word sequences, so a description
+is tokenized once no matter how many keywords exist; regex rules are screened
+by one combined pattern before being searched individually. Payment method
+rules are grouped by method and amount range rules are indexed by amount, so
+an expense only checks the rules that can apply to it.
+"""
+
+import math
+import re
+from bisect import bisect_left
+from functools import lru_cache
+
+RULE_TYPES = ["Keyword", "Regex", "Amount Range", "Payment Method"]
+DEFAULT_CATEGORY = "Other"
+WORD_PATTERN = re.compile(r'\w+')
+# Characters that only make sense in a regex; a keyword containing them would
+# silently be split into words instead
+REGEX_CHARACTERS = re.compile(r'[|()\[\]{}*+?^$\\]')
+
+
+def keyword_tokens(text):
+    """Split text into the lowercase words used for keyword matching"""
+    return tuple(WORD_PATTERN.findall(text.casefold()))
+
+
+class CategoryMatcher:
+    def __init__(self, rules, default_category=DEFAULT_CATEGORY, cache_size=65536):
+        """Compile rules (dicts or rows from the category_rules table) into one matcher"""
+        self.default_category = default_category
+        # Rules are evaluated in priority order; the first one that fully matches
+        # wins, so a lower index always means a higher priority
+        self.rules = sorted(
+            (dict(rule) for rule in rules),
+            key=lambda rule: (-(rule.get('priority') or 0), rule.get('id') or 0)
+        )
+        self.bounds = [
+            (
+                -math.inf if rule.get('min_amount') is None else rule['min_amount'],
+                math.inf if rule.get('max_amount') is None else rule['max_amount'],
+            )
+            for rule in self.rules
+        ]
+
+        # Keywords map their word sequence to rule indexes; every sequence of up
+        # to max_words words in a description is one dictionary lookup
+        self.keywords = {}
+        self.max_words = 0
+        self.regexes = []
+        self.payment_rules = {}
+        amount_rules = []
+        for index, rule in enumerate(self.rules):
+            if rule['rule_type'] == "Keyword":
+                words = keyword_tokens(rule['pattern'])
+                self.keywords.setdefault(words, []).append(index)
+                self.max_words = max(self.max_words, len(words))
+            elif rule['rule_type'] == "Regex":
+                self.regexes.append((index, re.compile(rule['pattern'], re.IGNORECASE)))
+            elif rule['rule_type'] == "Payment Method":
+                self.payment_rules.setdefault(rule['pattern'], []).append(index)
+            else:
+                amount_rules.append(index)
+        # Regexes without groups are screened together by one combined search
+        self.screened_regexes = [(index, regex) for index, regex in self.regexes if not regex.groups]
+        self.regex_screen = _combine_regexes(regex for _, regex in self.screened_regexes)
+        if self.regex_screen is None:
+            self.screened_regexes = []
+        self.other_regexes = [item for item in self.regexes if item not in self.screened_regexes]
+        self._index_amount_rules(amount_rules)
+
+        self.candidates = lru_cache(maxsize=cache_size)(self._candidates)
+
+    def _index_amount_rules(self, amount_rules):
+        """Precompute the first amount range rule covering each stretch of amounts
+
+        The rule bounds split the amounts into points (the bounds themselves)
+        and the open intervals between them; every amount in one piece is
+        covered by the same rules, so one bisect finds the winning rule.
+        """
+        self.amount_points = sorted({bound for index in amount_rules for bound in self.bounds[index]
+                                     if math.isfinite(bound)})
+        points = self.amount_points
+        samples = []
+        for i, point in enumerate(points):
+            previous = points[i - 1] if i else point - 1
+            samples += [(previous + point) / 2, point]
+        samples.append(points[-1] + 1 if points else 0)
+        self.unbounded_amount_rule = next(
+            (index for index in amount_rules if self.bounds[index] == (-math.inf, math.inf)), None
+        )
+        self.amount_winners = [
+            next((index for index in amount_rules if self.bounds[index][0] <= amount <= self.bounds[index][1]), None)
+            for amount in samples
+        ]
+
+    def _amount_rule(self, amount):
+        """Return the index of the first amount range rule covering an amount, or None"""
+        if amount is None:
+            return self.unbounded_amount_rule
+        i = bisect_left(self.amount_points, amount)
+        is_point = i < len(self.amount_points) and self.amount_points[i] == amount
+        return self.amount_winners[2 * i + 1 if is_point else 2 * i]
+
+    def _text_rules(self, description):
+        """Return the indexes of text rules that match a description"""
+        hits = set()
+        if not description:
+            return hits
+        if self.keywords:
+            words = keyword_tokens(description)
+            for start in range(len(words)):
+                for end in range(start + 1, min(start + self.max_words, len(words)) + 1):
+                    hits.update(self.keywords.get(words[start:end], ()))
+        if self.screened_regexes and self.regex_screen.search(description):
+            for index, regex in self.screened_regexes:
+                if regex.search(description):
+                    hits.add(index)
+        for index, regex in self.other_regexes:
+            if regex.search(description):
+                hits.add(index)
+        return hits
+
+    def _candidates(self, description, payment_method):
+        """Return, in priority order, the text and payment method rules that can apply"""
+        hits = self._text_rules(description)
+        hits.update(self.payment_rules.get(payment_method, ()))
+        return tuple(sorted(hits))
+
+    def categorize(self, description, amount=None, payment_method=None):
+        """Return the category for an expense, or the default if no rule applies"""
+        return self.match(description, amount, payment_method) or self.default_category
+
+    def match(self, description, amount=None, payment_method=None):
+        """Return the category of the first rule that applies to an expense, or None"""
+        best = self._amount_rule(amount)
+        for index in self.candidates(description or '', payment_method):
+            if best is not None and index > best:
+                break
+            low, high = self.bounds[index]
+            if amount is None:
+                if low == -math.inf and high == math.inf:
+                    return self.rules[index]['category']
+            elif low <= amount <= high:
+                return self.rules[index]['category']
+        return self.rules[best]['category'] if best is not None else None
+
+
+def _combine_regexes(regexes):
+    """Join group-free regexes into one pattern that matches wherever any of them does
+
+    Returns None if there are none, or if they cannot be combined (e.g. one
+    sets global flags, which must open a pattern).
+    """
+    patterns = [f'(?:{regex.pattern})' for regex in regexes]
+    if not patterns:
+        return None
+    try:
+        return re.compile('|'.join(patterns), re.IGNORECASE)
+    except re.error:
+        return None
+
+
+def validate_rule(rule_type, pattern, min_amount=None, max_amount=None):
+    """Return an error message for an invalid rule, or None if it is valid"""
+    if rule_type not in RULE_TYPES:
+        return f"Unknown rule type: {rule_type}"
+    if rule_type in ("Keyword", "Regex", "Payment Method") and not (pattern or '').strip():
+        return "Please enter a pattern for this rule"
+    if rule_type == "Keyword" and not keyword_tokens(pattern):
+        return "Keywords must contain at least one letter or digit"
+    if rule_type == "Keyword" and REGEX_CHARACTERS.search(pattern):
+        return "Keywords are matched as plain words; use a Regex rule for patterns like uber|ola"
+    if rule_type == "Regex":
+        try:
+            re.compile(pattern, re.IGNORECASE)
+        except re.error as e:
+            return f"Invalid regular expression: {e}"
+    if rule_type == "Amount Range" and min_amount is None and max_amount is None:
+        return "Please enter a minimum or maximum amount"
+    if min_amount is not None and max_amount is not None and min_amount > max_amount:
+        return "Minimum amount cannot be greater than maximum amount"
+    return None
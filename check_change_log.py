@@ -0,0 +1,103 @@
+"""
+Change Log Check for Personal Expense Tracker
+This script keeps a client-side copy of the expenses in sync through
+changes_since(version) across inserts, updates, deletes, clears and a
+compaction, and checks after every step that the copy matches the database.
+"""
+
+import os
+import sys
+import tempfile
+
+from app import ExpenseTracker
+
+COLUMNS = ["date", "category", "description", "amount", "payment_method"]
+
+
+class Replica:
+    def __init__(self, tracker):
+        """Client-side copy of the expenses, kept in sync from the change log"""
+        self.tracker = tracker
+        self.rows = {}
+        self.version = 0
+        self.resyncs = 0
+
+    def resync(self):
+        """Reload everything, starting from the version read before the reload"""
+        self.version = self.tracker.get_current_version()
+        expenses = self.tracker.get_expenses()
+        self.rows = {row.id: tuple(getattr(row, column) for column in COLUMNS) for row in expenses.itertuples()}
+        self.resyncs += 1
+
+    def sync(self):
+        """Apply the changes since the last sync, falling back to a resync when told to"""
+        changes = self.tracker.changes_since(self.version)
+        if changes is None:
+            self.resync()
+            return
+        for change in changes.itertuples():
+            if change.op == 'clear':
+                self.rows.clear()
+            elif change.op == 'delete':
+                self.rows.pop(change.expense_id, None)
+            else:
+                self.rows[change.expense_id] = tuple(getattr(change, column) for column in COLUMNS)
+            self.version = change.version
+
+
+def check(name, replica):
+    """Sync the replica and compare it with the database; returns True if they match"""
+    replica.sync()
+    expenses = replica.tracker.get_expenses()
+    expected = {row.id: tuple(getattr(row, column) for column in COLUMNS) for row in expenses.itertuples()}
+    ok = replica.rows == expected
+    print(f"{'✅' if ok else '❌'} {name}: {len(expected)} expenses, client at version {replica.version}")
+    return ok
+
+
+def main():
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        tracker = ExpenseTracker(os.path.join(tmp_dir, "check.db"))
+        replica = Replica(tracker)
+        results.append(check("empty database", replica))
+
+        # Insert, update and delete one expense between two syncs
+        tracker.add_expense("2024-01-05", "Other", "Uber to airport", 450.0, "Cash")
+        tracker.add_expense("2024-01-06", "Other", "Groceries", 1200.0, "Debit Card")
+        results.append(check("inserts", replica))
+        tracker.add_expense("2024-01-07", "Other", "Uber home", 300.0, "Cash")
+        tracker.add_rule("Transportation", "Keyword", "uber")
+        tracker.recategorize_expenses()
+        doomed = int(tracker.get_expenses().query("description == 'Uber home'").id.iloc[0])
+        tracker.delete_expense(doomed)
+        net = tracker.changes_since(replica.version)
+        ok = net[net.expense_id == doomed].op.tolist() == ['delete']
+        print(f"{'✅' if ok else '❌'} insert, update and delete net to one delete")
+        results.append(ok)
+        results.append(check("insert, update, delete", replica))
+
+        # Clear everything and insert again before the client syncs
+        tracker.clear_expenses()
+        tracker.add_expense("2024-02-01", "Other", "Coffee", 90.0, "Cash")
+        results.append(check("clear, then insert", replica))
+
+        # Leave one client behind while the log is compacted
+        stale = Replica(tracker)
+        stale.resync()
+        for day in range(1, 29):
+            tracker.add_expense(f"2024-03-{day:02d}", "Other", "Lunch", 150.0, "Cash")
+        tracker.delete_expense(int(tracker.get_expenses().id.iloc[0]))
+        tracker.compact_changes(retention=5)
+        ok = tracker.changes_since(stale.version) is None
+        print(f"{'✅' if ok else '❌'} client from before the compaction is told to resync")
+        results.append(ok)
+        results.append(check("stale client after compaction", stale) and stale.resyncs == 2)
+        results.append(check("current client after compaction", replica))
+
+    print(f"\n{sum(results)}/{len(results)} checks passed")
+    sys.exit(0 if all(results) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,377 @@
+"""
+Spending Forecasts and Anomaly Detection for Personal Expense Tracker
+Models are kept in the expenses database and updated incrementally from new
+expenses by a background worker; the Streamlit pages only read the results.
+"""
+
+import json
+import math
+import sqlite3
+import threading
+from datetime import date, datetime
+
+import pandas as pd
+
+FORECAST_HORIZON_DAYS = 30
+# Weekly seasonal exponential smoothing parameters
+LEVEL_SMOOTHING = 0.2
+SEASON_SMOOTHING = 0.1
+# An expense is anomalous when its log amount is this many standard deviations
+# above the category mean, once the category has enough history
+ANOMALY_Z_SCORE = 3.0
+ANOMALY_MIN_HISTORY = 20
+
+
+class SpendingForecaster:
+    def __init__(self, db_path="expenses.db"):
+        self.db_path = db_path
+        self.init_tables()
+
+    def init_tables(self):
+        """Create the tables holding model state and results"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS forecast_state (
+                key TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS forecast_category_stats (
+                category TEXT PRIMARY KEY,
+                count INTEGER NOT NULL,
+                mean REAL NOT NULL,
+                m2 REAL NOT NULL
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS forecast_daily_totals (
+                category TEXT NOT NULL,
+                date TEXT NOT NULL,
+                total REAL NOT NULL,
+                PRIMARY KEY (category, date)
+            )
+        ''')
+        # Smoothing state per category, fitted through last_day (a date ordinal)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS forecast_models (
+                category TEXT PRIMARY KEY,
+                first_day INTEGER NOT NULL,
+                last_day INTEGER NOT NULL,
+                days INTEGER NOT NULL,
+                level REAL NOT NULL,
+                season TEXT NOT NULL,
+                squared_error REAL NOT NULL
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS expense_forecasts (
+                category TEXT PRIMARY KEY,
+                daily_average REAL NOT NULL,
+                forecast REAL NOT NULL,
+                lower REAL NOT NULL,
+                upper REAL NOT NULL,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS expense_anomalies (
+                expense_id INTEGER PRIMARY KEY,
+                date TEXT NOT NULL,
+                category TEXT NOT NULL,
+                description TEXT,
+                amount REAL NOT NULL,
+                typical_amount REAL NOT NULL,
+                z_score REAL NOT NULL,
+                detected_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        conn.commit()
+        conn.close()
+
+    def update(self, batch_size=50000):
+        """Bring the models up to date; returns the number of expenses processed
+
+        New expenses are folded into the existing models. If any expense was
+        updated or deleted since the last run, or the change log has been
+        compacted past it, the models are rebuilt instead.
+        Everything is read and fitted in memory first and then written in one
+        short transaction, so the app's writers are never blocked for a refit.
+
+        Each category's smoothing state is stored fitted through yesterday and
+        only advanced over the days since; it is replayed from the category's
+        first day only when a new expense is dated on or before its last
+        fitted day.
+        """
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        state = dict(cursor.execute('SELECT key, value FROM forecast_state').fetchall())
+        last_version = state.get('version', 0)
+        last_expense_id = state.get('expense_id', 0)
+        today = datetime.now().date()
+
+        cursor.execute('SELECT MAX(version) FROM expense_changes')
+        version = cursor.fetchone()[0] or 0
+        cursor.execute(
+            "SELECT COUNT(*) FROM expense_changes WHERE version > ? AND op != 'insert'", (last_version,)
+        )
+        rebuild = cursor.fetchone()[0] > 0
+        # Entries after the last version may have been compacted away
+        cursor.execute("SELECT value FROM change_log_state WHERE key = 'horizon'")
+        horizon = cursor.fetchone()
+        if horizon and last_version < horizon[0]:
+            rebuild = True
+        if rebuild:
+            last_expense_id = 0
+            stats = {}
+        else:
+            stats = {
+                category: [count, mean, m2]
+                for category, count, mean, m2 in cursor.execute('SELECT * FROM forecast_category_stats')
+            }
+
+        daily = {}
+        anomalies = []
+        processed = 0
+        while True:
+            cursor.execute('''
+                SELECT id, date, category, description, amount FROM expenses
+                WHERE id > ? ORDER BY id LIMIT ?
+            ''', (last_expense_id, batch_size))
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            self._ingest(rows, stats, daily, anomalies)
+            processed += len(rows)
+            last_expense_id = rows[-1][0]
+
+        # Forecasts also move with the calendar, so refit at least once a day
+        if not rebuild and not processed and state.get('forecast_day') == today.toordinal():
+            conn.close()
+            return 0
+
+        new_totals = {}
+        for (category, day), total in daily.items():
+            new_totals.setdefault(category, {})[_day_number(day)] = total
+        models = {} if rebuild else {
+            category: {'first_day': first_day, 'last_day': last_day, 'days': days, 'level': level,
+                       'season': json.loads(season), 'squared_error': squared_error}
+            for category, first_day, last_day, days, level, season, squared_error
+            in cursor.execute('SELECT * FROM forecast_models')
+        }
+        forecasts = []
+        for category in sorted(set(models) | set(new_totals)):
+            model = models.get(category)
+            totals = new_totals.get(category, {})
+            if model is None or (totals and min(totals) <= model['last_day']):
+                # Backdated expense (or no model yet): replay the whole category
+                model = None
+                since = None
+            else:
+                since = model['last_day']
+            if not rebuild:
+                query = 'SELECT date, total FROM forecast_daily_totals WHERE category = ?'
+                params = [category]
+                if since is not None:
+                    query += ' AND date > ?'
+                    params.append(date.fromordinal(since).strftime('%Y-%m-%d'))
+                totals = dict(totals)
+                for day, total in cursor.execute(query, params).fetchall():
+                    day = _day_number(day)
+                    totals[day] = totals.get(day, 0.0) + total
+            if model is None:
+                if not totals:
+                    continue
+                model = _new_model(min(totals))
+            models[category] = _fit_weekly_model(model, totals, today.toordinal() - 1)
+            forecast = _forecast(category, model, totals, today)
+            if forecast:
+                forecasts.append(forecast)
+
+        if rebuild:
+            for table in ('forecast_category_stats', 'forecast_daily_totals', 'expense_anomalies', 'forecast_models'):
+                cursor.execute(f'DELETE FROM {table}')
+        cursor.executemany('''
+            INSERT INTO forecast_daily_totals (category, date, total) VALUES (?, ?, ?)
+            ON CONFLICT (category, date) DO UPDATE SET total = total + excluded.total
+        ''', [(category, date, total) for (category, date), total in daily.items()])
+        cursor.executemany('''
+            INSERT OR REPLACE INTO expense_anomalies
+                (expense_id, date, category, description, amount, typical_amount, z_score)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', anomalies)
+        cursor.executemany(
+            'INSERT OR REPLACE INTO forecast_category_stats (category, count, mean, m2) VALUES (?, ?, ?, ?)',
+            [(category, *values) for category, values in stats.items()]
+        )
+        cursor.executemany('''
+            INSERT OR REPLACE INTO forecast_models
+                (category, first_day, last_day, days, level, season, squared_error)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', [
+            (category, model['first_day'], model['last_day'], model['days'], model['level'],
+             json.dumps(model['season']), model['squared_error'])
+            for category, model in models.items()
+        ])
+        cursor.execute('DELETE FROM expense_forecasts')
+        cursor.executemany('''
+            INSERT INTO expense_forecasts (category, daily_average, forecast, lower, upper)
+            VALUES (?, ?, ?, ?, ?)
+        ''', forecasts)
+        cursor.executemany(
+            'INSERT OR REPLACE INTO forecast_state (key, value) VALUES (?, ?)',
+            [('version', version), ('expense_id', last_expense_id), ('forecast_day', today.toordinal())]
+        )
+        conn.commit()
+        conn.close()
+        return processed
+
+    def refit(self):
+        """Rebuild every model from the full expense history"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        for table in ('forecast_state', 'forecast_category_stats', 'forecast_daily_totals', 'expense_anomalies',
+                      'forecast_models'):
+            cursor.execute(f'DELETE FROM {table}')
+        conn.commit()
+        conn.close()
+        return self.update()
+
+    def _ingest(self, rows, stats, daily, anomalies):
+        """Score a batch of new expenses for anomalies and fold them into the in-memory models"""
+        for expense_id, date, category, description, amount in rows:
+            daily[(category, date)] = daily.get((category, date), 0.0) + amount
+            if amount <= 0:
+                continue
+            # Welford's online mean and variance of the log amount per category
+            count, mean, m2 = stats.setdefault(category, [0, 0.0, 0.0])
+            value = math.log(amount)
+            if count >= ANOMALY_MIN_HISTORY:
+                std = math.sqrt(m2 / (count - 1))
+                if std > 0 and (value - mean) / std > ANOMALY_Z_SCORE:
+                    anomalies.append((expense_id, date, category, description, amount,
+                                      round(math.exp(mean), 2), round((value - mean) / std, 2)))
+            count += 1
+            delta = value - mean
+            mean += delta / count
+            m2 += delta * (value - mean)
+            stats[category] = [count, mean, m2]
+
+    def get_forecasts(self):
+        """Retrieve the stored forecasts for the next FORECAST_HORIZON_DAYS days"""
+        conn = sqlite3.connect(self.db_path)
+        df = pd.read_sql_query('SELECT * FROM expense_forecasts ORDER BY forecast DESC', conn)
+        conn.close()
+        return df
+
+    def get_anomalies(self, limit=50):
+        """Retrieve the most recent unusual expenses"""
+        conn = sqlite3.connect(self.db_path)
+        df = pd.read_sql_query(
+            'SELECT * FROM expense_anomalies ORDER BY date DESC, expense_id DESC LIMIT ?', conn, params=[limit]
+        )
+        conn.close()
+        return df
+
+
+def _day_number(day):
+    """Convert a 'YYYY-MM-DD' date to its ordinal day number"""
+    return datetime.strptime(day, '%Y-%m-%d').toordinal()
+
+
+def _forecast(category, model, totals, today):
+    """Forecast a category's next FORECAST_HORIZON_DAYS days; returns a result row, or None
+
+    Today is still in progress, so its total so far is folded into a copy of
+    the model rather than into the stored state.
+    """
+    model = _fit_weekly_model(dict(model, season=list(model['season'])), totals, today.toordinal())
+    if not model['days']:
+        return None
+    level, season, sigma = _model_estimates(model)
+    forecast = sum(
+        max(level + season[date.fromordinal(today.toordinal() + h).weekday()], 0.0)
+        for h in range(1, FORECAST_HORIZON_DAYS + 1)
+    )
+    margin = 1.96 * sigma * math.sqrt(FORECAST_HORIZON_DAYS)
+    return (category, round(max(level, 0.0), 2), round(forecast, 2),
+            round(max(forecast - margin, 0.0), 2), round(forecast + margin, 2))
+
+
+def _new_model(first_day):
+    """Return empty smoothing state for a series starting on the given day number"""
+    return {'first_day': first_day, 'last_day': first_day - 1, 'days': 0, 'level': 0.0,
+            'season': [0.0] * 7, 'squared_error': 0.0}
+
+
+def _fit_weekly_model(model, totals, until):
+    """Advance additive exponential smoothing with a weekly season through day number until
+
+    Days without expenses count as zero. The first seven days are only
+    collected (level holds their sum and season their values) and then set
+    the starting level and weekday offsets; after that every day adds its
+    one-step-ahead error to squared_error. Updates model in place and
+    returns it.
+    """
+    season = model['season']
+    for day in range(model['last_day'] + 1, until + 1):
+        weekday = date.fromordinal(day).weekday()
+        value = totals.get(day, 0.0)
+        if model['days'] < 7:
+            season[weekday] = value
+            model['level'] += value
+            if model['days'] == 6:
+                model['level'] /= 7
+                season[:] = [total - model['level'] for total in season]
+        else:
+            level = model['level']
+            error = value - (level + season[weekday])
+            model['squared_error'] += error * error
+            model['level'] = LEVEL_SMOOTHING * (value - season[weekday]) + (1 - LEVEL_SMOOTHING) * level
+            season[weekday] = SEASON_SMOOTHING * (value - level) + (1 - SEASON_SMOOTHING) * season[weekday]
+        model['days'] += 1
+        model['last_day'] = day
+    return model
+
+
+def _model_estimates(model):
+    """Return a model's level, seven weekday offsets and one-step-ahead error standard deviation"""
+    days = model['days']
+    if days >= 7:
+        level, season = model['level'], model['season']
+        steps = days - 7
+        sigma = math.sqrt(model['squared_error'] / steps if steps else sum(s * s for s in season) / 7)
+        return level, season, sigma
+    # Still inside the first week: the weekdays seen so far set the offsets
+    level = model['level'] / days
+    seen = [date.fromordinal(model['first_day'] + i).weekday() for i in range(days)]
+    season = [model['season'][weekday] - level if weekday in seen else 0.0 for weekday in range(7)]
+    sigma = math.sqrt(sum((model['season'][weekday] - level) ** 2 for weekday in seen) / days)
+    return level, season, sigma
+
+
+class ForecastWorker(threading.Thread):
+    def __init__(self, forecaster, interval=60):
+        """Background thread that keeps the forecaster's models up to date"""
+        super().__init__(name="forecast-worker", daemon=True)
+        self.forecaster = forecaster
+        self.interval = interval
+        self.last_error = None
+        self._wake = threading.Event()
+
+    def trigger(self):
+        """Ask the worker to update now instead of waiting for the next interval"""
+        self._wake.set()
+
+    def run(self):
+        while True:
+            try:
+                self.forecaster.update()
+                self.last_error = None
+            except Exception as e:
+                # Usually a lock held by a writer; record it and retry on the next cycle
+                # rather than letting the thread die for the life of the process
+                self.last_error = f"{type(e).__name__}: {e}"
+            self._wake.wait(self.interval)
+            self._wake.clear()
@@ -0,0 +1,273 @@
+"""
+Load Test for Personal Expense Tracker
+This script simulates many concurrent users logging in, adding expenses,
+browsing and opening analytics against a generated database, and reports
+latency percentiles, throughput and database lock errors per operation.
+
+Two modes are available:
+- direct:  calls ExpenseTracker and the page functions in app.py from one
+           thread per user, the way a single Streamlit server process runs
+           its sessions (default)
+- apptest: runs app.py end to end in Streamlit's headless AppTest harness,
+           one process per user because AppTest sessions cannot share one
+"""
+
+import argparse
+import math
+import multiprocessing
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_PATH = os.path.join(APP_DIR, "app.py")
+
+CATEGORIES = [
+    "Food & Dining", "Transportation", "Shopping", "Entertainment",
+    "Healthcare", "Utilities", "Housing", "Education", "Travel", "Mobile & Internet", "Other"
+]
+
+PAYMENT_METHODS = ["Cash", "Credit Card", "Debit Card", "Bank Transfer", "Digital Wallet", "Other"]
+
+OPERATIONS = ["login", "add expense", "browse", "analytics"]
+
+PASSWORD = "load-test-password"
+
+
+def generate_database(db_path, num_expenses, num_users):
+    """Create a database with the app's schema, num_users accounts and num_expenses random expenses"""
+    from app import ExpenseTracker
+
+    tracker = ExpenseTracker(db_path)
+    for user in range(num_users):
+        tracker.register_user(f"user{user}", PASSWORD)
+
+    start_date = datetime.now() - timedelta(days=365 * 3)
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    cursor.executemany('''
+        INSERT INTO expenses (date, category, description, amount, payment_method)
+        VALUES (?, ?, ?, ?, ?)
+    ''', (
+        (
+            (start_date + timedelta(days=random.randint(0, 365 * 3))).strftime('%Y-%m-%d'),
+            random.choice(CATEGORIES),
+            "Generated expense",
+            round(random.uniform(5, 500), 2),
+            random.choice(PAYMENT_METHODS),
+        )
+        for _ in range(num_expenses)
+    ))
+    conn.commit()
+    conn.close()
+
+
+def is_lock_error(message):
+    """Return True if an error message comes from SQLite lock contention"""
+    return "database is locked" in message or "database table is locked" in message
+
+
+class Results:
+    def __init__(self):
+        self.samples = []
+        self._lock = threading.Lock()
+
+    def record(self, operation, seconds, error=None):
+        """Store the latency and error (if any) of one operation"""
+        with self._lock:
+            self.samples.append((operation, seconds, error))
+
+    def timed(self, operation, func, *args):
+        """Run func as one timed operation, recording any exception as its error"""
+        started = time.perf_counter()
+        try:
+            error = func(*args)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        self.record(operation, time.perf_counter() - started, error)
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    index = max(0, math.ceil(fraction * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+def find_widget(elements, label):
+    """Return the AppTest widget with the given label"""
+    return next(element for element in elements if element.label == label)
+
+
+def run_app(at):
+    """Rerun an AppTest script
+
+    In streamlit 1.28, AppTest.run() reads the shutdown event's client state
+    right after the script stops, and under load it can get there before the
+    script thread has sent it, raising KeyError('client_state'). The element
+    tree is already complete by then and query params are unused here, so
+    that error is ignored.
+    """
+    try:
+        at.run()
+    except KeyError as e:
+        if e.args != ('client_state',):
+            raise
+
+
+def app_errors(at):
+    """Return the first exception shown by an AppTest run, or None"""
+    return at.exception[0].message if len(at.exception) else None
+
+
+def run_apptest_session(user, iterations, timeout):
+    """Drive one headless Streamlit session through the user journey; returns its samples"""
+    from streamlit.testing.v1 import AppTest
+
+    import app
+
+    tracker = app.ExpenseTracker()
+    at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+    # Render the login page once, untimed, so imports and the process's first
+    # script run don't count towards login latency
+    run_app(at)
+
+    def login():
+        # The login button calls st.experimental_rerun(), which AppTest in
+        # streamlit 1.28 cannot replay, so check the credentials directly and
+        # start the session already signed in
+        if not tracker.authenticate_user(f"user{user}", PASSWORD):
+            return "Login failed"
+        at.session_state['authenticated'] = True
+        at.session_state['username'] = f"user{user}"
+        run_app(at)
+        return app_errors(at)
+
+    def open_page(page):
+        find_widget(at.sidebar.selectbox, "Choose a page").select(page)
+        run_app(at)
+        return app_errors(at)
+
+    def add_expense():
+        error = open_page("➕ Add Expense")
+        if error:
+            return error
+        find_widget(at.text_input, "Description").input(f"Load test expense {random.randint(1, 1000)}")
+        find_widget(at.number_input, "Amount (₹)").set_value(round(random.uniform(5, 500), 2))
+        find_widget(at.button, "💾 Save Expense").click()
+        run_app(at)
+        if not any("Expense added" in element.value for element in at.success):
+            return app_errors(at) or "Expense was not saved"
+        return None
+
+    results = Results()
+    results.timed("login", login)
+    for _ in range(iterations):
+        results.timed("add expense", add_expense)
+        results.timed("browse", open_page, "📋 View Expenses")
+        results.timed("analytics", open_page, "📈 Analytics")
+    return results.samples
+
+
+def run_direct_session(user, iterations, timeout):
+    """Call the tracker and page functions the way one session's reruns would; returns its samples"""
+    import app
+
+    tracker = app.ExpenseTracker()
+
+    def login():
+        return None if tracker.authenticate_user(f"user{user}", PASSWORD) else "Login failed"
+
+    def add_expense():
+        tracker.add_expense(
+            datetime.now().strftime('%Y-%m-%d'),
+            random.choice(CATEGORIES + [None]),
+            f"Load test expense {random.randint(1, 1000)}",
+            round(random.uniform(5, 500), 2),
+            random.choice(PAYMENT_METHODS)
+        )
+
+    results = Results()
+    results.timed("login", login)
+    for _ in range(iterations):
+        results.timed("add expense", add_expense)
+        results.timed("browse", app.show_view_expenses, tracker)
+        results.timed("analytics", app.show_analytics, tracker)
+    return results.samples
+
+
+def print_report(results, elapsed):
+    """Print latency percentiles, throughput and error counts per operation"""
+    print(f"\n{'operation':<12} {'count':>7} {'ops/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+          f"{'errors':>7} {'locks':>6}")
+    for operation in OPERATIONS:
+        samples = [sample for sample in results.samples if sample[0] == operation]
+        if not samples:
+            continue
+        latencies = sorted(seconds * 1000 for _, seconds, _ in samples)
+        errors = [error for _, _, error in samples if error]
+        lock_errors = [error for error in errors if is_lock_error(error)]
+        print(f"{operation:<12} {len(samples):>7} {len(samples) / elapsed:>8.2f} "
+              f"{percentile(latencies, 0.50):>9.1f} {percentile(latencies, 0.95):>9.1f} "
+              f"{percentile(latencies, 0.99):>9.1f} {len(errors):>7} {len(lock_errors):>6}")
+
+    other_errors = sorted({error for _, _, error in results.samples if error and not is_lock_error(error)})
+    if other_errors:
+        print("\nOther errors:")
+        for error in other_errors[:10]:
+            print(f"  - {error}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate concurrent users of the expense tracker")
+    parser.add_argument("--mode", choices=["direct", "apptest"], default="direct", help="how sessions are driven")
+    parser.add_argument("--users", type=int, default=10, help="number of concurrent sessions")
+    parser.add_argument("--iterations", type=int, default=5, help="add/browse/analytics rounds per session")
+    parser.add_argument("--expenses", type=int, default=100000, help="expenses in the generated database")
+    parser.add_argument("--db", help="use an existing database instead of generating one")
+    parser.add_argument("--timeout", type=float, default=60, help="seconds allowed for one AppTest run")
+    args = parser.parse_args()
+
+    sys.path.insert(0, APP_DIR)
+    tmp_dir = None
+    if args.db:
+        db_path = os.path.abspath(args.db)
+    else:
+        tmp_dir = tempfile.TemporaryDirectory()
+        db_path = os.path.join(tmp_dir.name, "load_test.db")
+    # ExpenseTracker picks the database up from the environment in every session
+    os.environ["EXPENSE_DB_PATH"] = db_path
+
+    if not args.db:
+        print(f"🎯 Generating {args.expenses:,} expenses and {args.users} users in {db_path}...")
+        generate_database(db_path, args.expenses, args.users)
+
+    if args.mode == "apptest":
+        session = run_apptest_session
+        executor = ProcessPoolExecutor(max_workers=args.users, mp_context=multiprocessing.get_context("spawn"))
+    else:
+        session = run_direct_session
+        executor = ThreadPoolExecutor(max_workers=args.users)
+    results = Results()
+    print(f"🚀 Running {args.users} concurrent {args.mode} sessions x {args.iterations} iterations...")
+    started = time.perf_counter()
+    with executor:
+        futures = [executor.submit(session, user, args.iterations, args.timeout) for user in range(args.users)]
+        for future in futures:
+            results.samples.extend(future.result())
+    elapsed = time.perf_counter() - started
+
+    print_report(results, elapsed)
+    print(f"\n⏱️  {len(results.samples)} operations in {elapsed:.1f}s ({len(results.samples) / elapsed:.2f} ops/s overall)")
+
+    if tmp_dir:
+        tmp_dir.cleanup()
+
+
+if __name__ == "__main__":
+    main()